@@ -0,0 +1,261 @@
+# Copyright (C) 2026 Francisco CABRERA HERRE
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+import csv
+import datetime
+import hashlib
+import io
+import os
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text
+
+## Service HTTP en lecture seule pour les consommateurs aval (équipe prévision).
+## Les résultats sont lus par curseur côté serveur et envoyés lot par lot :
+## aucun export n'est matérialisé entièrement en mémoire.
+
+TAILLE_LOT = 10000
+
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def get_engine():
+    user = os.getenv("POSTGRES_USER", "admin")
+    password = os.getenv("POSTGRES_PASSWORD", "password")
+    db = os.getenv("POSTGRES_DB", "audit_energie")
+    host = os.getenv("DB_HOST", "db_audit")
+    return create_engine(f"postgresql://{user}:{password}@{host}:5432/{db}")
+
+engine = get_engine()
+
+
+# --- DEFINITION DES EXPORTS ---
+# Chaque export : requête SQL (mesures converties en float8 pour un schéma stable),
+# paramètres attendus et schéma Arrow de sortie.
+
+SCHEMA_MESURES = [
+    ("consommation", pa.float64()),
+    ("nucleaire", pa.float64()),
+    ("eolien", pa.float64()),
+    ("solaire", pa.float64()),
+]
+
+EXPORTS = {
+    "/serie/regionale": {
+        "requete": """
+            SELECT libelle_region, date_heure,
+                   consommation::float8 AS consommation, nucleaire::float8 AS nucleaire,
+                   eolien::float8 AS eolien, solaire::float8 AS solaire
+            FROM production_energie
+            WHERE libelle_region = :region AND date_heure >= :debut AND date_heure < :fin
+            ORDER BY date_heure ASC
+        """,
+        "parametres": ["region"],
+        "schema": pa.schema([("libelle_region", pa.string()), ("date_heure", pa.timestamp("us"))] + SCHEMA_MESURES),
+    },
+    "/serie/nationale": {
+        "requete": """
+            SELECT date_heure,
+                   SUM(consommation)::float8 AS consommation, SUM(nucleaire)::float8 AS nucleaire,
+                   SUM(eolien)::float8 AS eolien, SUM(solaire)::float8 AS solaire
+            FROM production_energie
+            WHERE date_heure >= :debut AND date_heure < :fin
+            GROUP BY 1 ORDER BY 1 ASC
+        """,
+        "parametres": [],
+        "schema": pa.schema([("date_heure", pa.timestamp("us"))] + SCHEMA_MESURES),
+    },
+    "/audits": {
+        "requete": """
+            SELECT id, date_audit, nom_fichier, taux_succes, nb_lignes_ignorees, conformite_statut,
+                   rapport_ia->>'verdict_final' AS verdict_final, rapport_ia::text AS rapport_ia
+            FROM registre_audit_ia
+            WHERE date_audit >= :debut AND date_audit < :fin
+            ORDER BY date_audit ASC, id ASC
+        """,
+        "parametres": [],
+        "schema": pa.schema([
+            ("id", pa.int64()),
+            ("date_audit", pa.timestamp("us", tz="UTC")),
+            ("nom_fichier", pa.string()),
+            ("taux_succes", pa.float64()),
+            ("nb_lignes_ignorees", pa.int64()),
+            ("conformite_statut", pa.bool_()),
+            ("verdict_final", pa.string()),
+            ("rapport_ia", pa.string()),
+        ]),
+    },
+}
+
+
+def obtenir_generation_ingestion(conn):
+    """
+    Identifiant de génération des données : évolue à chaque ingestion, libération
+    de quarantaine ou nouvel audit (lecture des clés primaires maximales, via index).
+    """
+    return conn.execute(text("""
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM production_energie) || '-' ||
+               (SELECT COALESCE(MAX(id), 0) FROM registre_audit_ia)
+    """)).scalar()
+
+
+def ouvrir_lots(conn, export, params):
+    """
+    Exécute la requête avec un curseur côté serveur et lit immédiatement le premier
+    lot : une erreur SQL survient ainsi avant l'envoi des en-têtes HTTP.
+    Retourne un itérateur de RecordBatch Arrow.
+    """
+    resultat = conn.execution_options(stream_results=True).execute(text(export["requete"]), params)
+    colonnes = list(resultat.keys())
+    partitions = resultat.partitions(TAILLE_LOT)
+    premier_lot = next(partitions, [])
+
+    def iterer_lots():
+        for lignes in chain([premier_lot], partitions):
+            if lignes:
+                df = pd.DataFrame(lignes, columns=colonnes)
+                yield pa.RecordBatch.from_pandas(df, schema=export["schema"], preserve_index=False)
+
+    return iterer_lots()
+
+
+class FluxChunked(io.RawIOBase):
+    """
+    Enveloppe la réponse HTTP en 'Transfer-Encoding: chunked' pour écrire
+    au fil de l'eau sans connaître la taille totale de l'export.
+    """
+    def __init__(self, sortie):
+        self.sortie = sortie
+
+    def writable(self):
+        return True
+
+    def write(self, donnees):
+        if donnees:
+            self.sortie.write(f"{len(donnees):X}\r\n".encode() + bytes(donnees) + b"\r\n")
+        return len(donnees)
+
+    def terminer(self):
+        self.sortie.write(b"0\r\n\r\n")
+
+
+def ecrire_arrow(flux, lots, schema):
+    with pa.ipc.new_stream(flux, schema) as writer:
+        for lot in lots:
+            writer.write_batch(lot)
+
+
+def ecrire_parquet(flux, lots, schema):
+    # Un groupe de lignes Parquet par lot : seul le lot courant est en mémoire
+    with pq.ParquetWriter(pa.PythonFile(flux, mode="w"), schema) as writer:
+        for lot in lots:
+            writer.write_batch(lot)
+
+
+def ecrire_csv_gzip(flux, lots, schema):
+    compresseur = zlib.compressobj(wbits=31)  # wbits=31 : en-tête gzip
+    tampon = io.StringIO()
+    csv.writer(tampon, delimiter=";").writerow(schema.names)
+    flux.write(compresseur.compress(tampon.getvalue().encode("utf-8")))
+    for lot in lots:
+        tampon = io.StringIO()
+        lot.to_pandas().to_csv(tampon, sep=";", index=False, header=False)
+        flux.write(compresseur.compress(tampon.getvalue().encode("utf-8")))
+    flux.write(compresseur.flush())
+
+
+ECRIVAINS = {"arrow": ecrire_arrow, "parquet": ecrire_parquet, "csv": ecrire_csv_gzip}
+
+
+class GestionnaireExport(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def envoyer_erreur(self, code, message):
+        corps = message.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        export = EXPORTS.get(url.path)
+        if export is None:
+            self.envoyer_erreur(404, f"Export inconnu. Disponibles : {', '.join(EXPORTS)}")
+            return
+
+        arguments = {cle: valeurs[0] for cle, valeurs in parse_qs(url.query).items()}
+        format_sortie = arguments.get("format", "arrow")
+        if format_sortie not in FORMATS:
+            self.envoyer_erreur(400, f"Format inconnu. Disponibles : {', '.join(FORMATS)}")
+            return
+
+        manquants = [p for p in export["parametres"] if p not in arguments]
+        if manquants:
+            self.envoyer_erreur(400, f"Paramètres manquants : {', '.join(manquants)}")
+            return
+
+        params = {p: arguments[p] for p in export["parametres"]}
+        try:
+            params["debut"] = datetime.date.fromisoformat(arguments.get("debut", "2025-01-01"))
+            params["fin"] = datetime.date.fromisoformat(arguments.get("fin", "2100-01-01"))
+        except ValueError:
+            self.envoyer_erreur(400, "Paramètres 'debut' et 'fin' attendus au format AAAA-MM-JJ")
+            return
+
+        entetes_envoyees = False
+        try:
+            with engine.connect() as conn:
+                # ETag : génération d'ingestion + requête ; un client à jour reçoit un 304 sans relecture
+                generation = obtenir_generation_ingestion(conn)
+                etag = '"' + hashlib.sha256(f"{generation}|{url.path}|{sorted(arguments.items())}".encode()).hexdigest()[:32] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                lots = ouvrir_lots(conn, export, params)
+
+                self.send_response(200)
+                self.send_header("Content-Type", FORMATS[format_sortie])
+                if format_sortie == "csv":
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("ETag", etag)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                entetes_envoyees = True
+
+                flux = FluxChunked(self.wfile)
+                ECRIVAINS[format_sortie](flux, lots, export["schema"])
+                flux.terminer()
+        except Exception as e:
+            print(f"Erreur lors de l'export {url.path} : {e}")
+            if entetes_envoyees:
+                # Réponse déjà commencée : on coupe la connexion pour signaler l'échec
+                self.close_connection = True
+            else:
+                self.envoyer_erreur(500, "Erreur interne lors de l'export")
+
+
+def lancer_serveur(hote="0.0.0.0", port=8502):
+    serveur = ThreadingHTTPServer((hote, port), GestionnaireExport)
+    print(f"Information : service d'export en écoute sur http://{hote}:{port}")
+    serveur.serve_forever()
+
+
+if __name__ == "__main__":
+    lancer_serveur(port=int(os.getenv("EXPORT_PORT", "8502")))
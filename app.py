@@ -11,6 +11,7 @@ import plotly.express as px
 import requests
 import datetime
 import os
+from src.database.queries_audit import lister_historique_audits
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="L'Auditeur Souverain", layout="wide")
@@ -27,7 +28,7 @@ engine = get_engine()
 # --- SIDEBAR ---
 st.sidebar.header("🛡️ Intégrité")
 with engine.connect() as conn:
-    count_q = pd.read_sql("SELECT count(*) FROM production_quarantaine", conn).iloc[0,0]
+    count_q = pd.read_sql("SELECT count(*) FROM production_quarantaine WHERE version_liberation IS NULL", conn).iloc[0,0]
     if count_q > 0:
         st.sidebar.error(f"⚠️ {count_q} lignes en quarantaine")
     else:
@@ -39,6 +40,10 @@ mode = st.sidebar.radio("Mode d'affichage", ["Vue Régionale", "Vue Nationale",
 start_date = st.sidebar.date_input("Début", datetime.date(2025, 1, 1))
 end_date = st.sidebar.date_input("Fin", datetime.date(2026, 12, 31))
 
+# Mode live : seule la section d'analyse est rafraîchie, et uniquement avec les nouvelles données
+mode_live = st.sidebar.toggle("🔄 Rafraîchissement automatique")
+intervalle_live = st.sidebar.number_input("Intervalle (secondes)", min_value=30, value=300, step=30, disabled=not mode_live)
+
 st.title("⚡ Gouvernance Énergétique")
 
 # --- CARTE DE FRANCE ---
@@ -91,12 +96,53 @@ try:
 except Exception as e:
     st.error(f"Erreur lors de la récupération de l'audit : {e}")
 
+# --- SECTION HISTORIQUE DES AUDITS ---
+with st.expander("📜 Historique des audits"):
+    col_v, col_d1, col_d2 = st.columns(3)
+    verdict_filtre = col_v.selectbox("Verdict", ["Tous", "CONFORME", "RÉSERVE", "NON CONFORME", "NON DÉTERMINÉ"])
+    debut_audit = col_d1.date_input("Audits depuis le", datetime.date(2025, 1, 1))
+    fin_audit = col_d2.date_input("Audits jusqu'au", datetime.date.today())
+
+    # Pile des curseurs de pagination (réinitialisée quand les filtres changent)
+    filtres_audit = (verdict_filtre, debut_audit, fin_audit)
+    if st.session_state.get("filtres_audit") != filtres_audit:
+        st.session_state["filtres_audit"] = filtres_audit
+        st.session_state["curseurs_audit"] = [None]
+
+    try:
+        with engine.connect() as conn:
+            audits, curseur_suivant = lister_historique_audits(
+                conn,
+                curseur=st.session_state["curseurs_audit"][-1],
+                verdict=None if verdict_filtre == "Tous" else verdict_filtre,
+                date_debut=debut_audit,
+                date_fin=fin_audit + datetime.timedelta(days=1),
+            )
+
+        if audits:
+            df_historique = pd.DataFrame(audits)
+            st.dataframe(df_historique, use_container_width=True, hide_index=True)
+        else:
+            st.info("Aucun audit pour ces critères.")
+
+        col_prec, col_suiv = st.columns(2)
+        if col_prec.button("⬅️ Page précédente", disabled=len(st.session_state["curseurs_audit"]) == 1):
+            st.session_state["curseurs_audit"].pop()
+            st.rerun()
+        if col_suiv.button("Page suivante ➡️", disabled=curseur_suivant is None):
+            st.session_state["curseurs_audit"].append(curseur_suivant)
+            st.rerun()
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération de l'historique : {e}")
+
 # --- SECTION ANALYSE DYNAMIQUE ---
 st.markdown("---")
 
 # 1. Initialisation
 query = None
 params = {}
+limite = None  # nombre maximal de points affichés par la vue (None : pas de limite)
+granularite = "D"  # taille d'un agrégat de la vue (pandas) : jour, ou heure pour la vue régionale
 
 if mode == "Vue Nationale":
     st.header("🇫🇷 Analyse Nationale")
@@ -115,13 +161,19 @@ elif mode == "Vue Régionale":
         regions = pd.read_sql("SELECT DISTINCT libelle_region FROM production_energie", conn)['libelle_region'].tolist()
     region_selected = st.selectbox("Choisir une région", regions)
     st.header(f"📍 Région : {region_selected}")
+    # Les 2000 points les plus récents de la période : la vue (et le mode live) suit la donnée la plus fraîche
     query = text("""
-        SELECT date_trunc('hour', date_heure) as date_heure, 
-               consommation, nucleaire, eolien, solaire
-        FROM production_energie 
-        WHERE libelle_region = :region AND date_heure BETWEEN :start AND :end
-        ORDER BY 1 ASC LIMIT 2000
+        SELECT * FROM (
+            SELECT date_trunc('hour', date_heure) as date_heure, 
+                   consommation, nucleaire, eolien, solaire
+            FROM production_energie 
+            WHERE libelle_region = :region AND date_heure BETWEEN :start AND :end
+            ORDER BY 1 DESC LIMIT 2000
+        ) AS derniers
+        ORDER BY 1 ASC
     """)
+    limite = 2000
+    granularite = "h"
     params = {"region": region_selected, "start": start_date, "end": end_date}
 
 else: # Comparaison
@@ -143,12 +195,60 @@ else: # Comparaison
     params = {"r1": r1, "r2": r2, "start": start_date, "end": end_date}
 
 # 2. Exécution et Affichage
-if query is not None: 
-    try:
-        with engine.connect() as conn:
+def charger_vue(query, params, cle_vue):
+    """
+    Charge les données de la vue. En mode live, la trame affichée est conservée
+    en session avec sa dernière date_heure et la génération d'ingestion
+    (MAX(id) de production_energie) au moment du chargement. Un rafraîchissement
+    sans nouvelle ligne ne relit rien ; sinon seuls les agrégats (heure/jour) à
+    partir de la plus ancienne date parmi la dernière date affichée et les lignes
+    arrivées depuis (ligne libérée de quarantaine, région en retard) sont relus et
+    remplacés. Seule la vue courante est conservée.
+    """
+    cache = st.session_state.get("cache_vue")
+    entree = cache[1] if mode_live and cache is not None and cache[0] == cle_vue else None
+
+    with engine.connect() as conn:
+        # Lue avant les données : une ligne insérée entre-temps sera reprise au rafraîchissement suivant
+        generation = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM production_energie")).scalar()
+
+        if entree is None:
             df = pd.read_sql(query, conn, params=params)
+        elif generation == entree["generation"]:
+            df = entree["df"]
+        else:
+            # Plus ancienne date parmi les lignes arrivées depuis le dernier chargement (index de clé primaire)
+            plus_ancienne = conn.execute(
+                text("SELECT MIN(date_heure) FROM production_energie WHERE id > :generation"),
+                {"generation": entree["generation"]}
+            ).scalar()
+            # Le dernier agrégat peut être incomplet : il est relu puis remplacé
+            depuis = entree["derniere_date"]
+            if plus_ancienne is not None:
+                depuis = min(depuis, pd.Timestamp(plus_ancienne).floor(granularite))
+            df_delta = pd.read_sql(query, conn, params={**params, "start": depuis})
+            df_cache = entree["df"]
+            df = pd.concat([df_cache[df_cache['date_heure'] < depuis], df_delta], ignore_index=True)
+            if limite is not None:
+                # Fenêtre glissante : même nombre de points que la vue sans rafraîchissement
+                df = df.tail(limite).reset_index(drop=True)
+
+    if mode_live and not df.empty:
+        st.session_state["cache_vue"] = (cle_vue, {
+            "df": df, "derniere_date": df['date_heure'].max(), "generation": generation
+        })
+    else:
+        st.session_state.pop("cache_vue", None)
+    return df
+
+
+def afficher_analyse():
+    try:
+        cle_vue = (mode, tuple(sorted(params.items())))
+        df = charger_vue(query, params, cle_vue)
         
         if not df.empty:
+            derniere_date = df['date_heure'].max()
             if mode == "Comparaison":
                 # On pivote pour avoir une colonne par région
                 df_pivot = df.pivot(index='date_heure', columns='libelle_region', values='total')
@@ -161,7 +261,16 @@ if query is not None:
                     st.line_chart(df[['solaire', 'eolien', 'nucleaire']])
                 with col_b:
                     st.area_chart(df['consommation'])
+            if mode_live:
+                st.caption(f"Dernière donnée affichée : {derniere_date}")
         else:
             st.warning("Aucune donnée trouvée pour cette période.")
     except Exception as e:
-        st.error(f"Erreur d'affichage : {e}")
\ No newline at end of file
+        st.error(f"Erreur d'affichage : {e}")
+
+if query is not None: 
+    if mode_live:
+        # Fragment Streamlit : seule cette section est ré-exécutée à chaque intervalle
+        st.fragment(run_every=intervalle_live)(afficher_analyse)()
+    else:
+        afficher_analyse()
@@ -3,12 +3,13 @@ from src.database.database_setup import SessionLocal
 from src.processor.init_qualite import initialiser_audit_qualite, extraire_resume_audit
 from src.processor.agent_ia import AgentAuditeurSouverain
 from src.processor.ingestion_sql import executer_ingestion_systeme
-from src.database.queries_ia import inserer_rapport_audit
+from src.processor.filtre_cles import filtrer_cles_deja_ingerees
+from src.database.queries_audit import inserer_rapport_audit
 from src.scraper.telecharger_donnees import executer_telechargement_incremental
 
 def run_pipeline():
     """
-    Orchestre le flux : téléchargement -> Audit qualité -> Ingestion SQL -> Rapport IA.
+    Orchestre le flux : téléchargement -> Filtrage des clés -> Audit qualité -> Ingestion SQL -> Rapport IA.
     """
     nom_csv = "delta_update.csv"
     print(f"Information : Lancement du pipeline pour {nom_csv}.")
@@ -25,6 +26,21 @@ def run_pipeline():
         print("Erreur : Échec du téléchargement.")
         sys.exit(1)
 
+    # ETAPE 1 bis : Filtrage des clés déjà ingérées (avant validation et aller-retour SQL)
+    print("--- ETAPE 1 bis : Filtrage des données déjà en base ---")
+    try:
+        nb_lignes_nouvelles = filtrer_cles_deja_ingerees()
+    except Exception as e:
+        print(f"Erreur lors du filtrage des données déjà en base : {e}")
+        return
+
+    if nb_lignes_nouvelles is None:
+        sys.exit(1)
+
+    if nb_lignes_nouvelles == 0:
+        print("Fin du pipeline : Aucune nouvelle donnée.")
+        return
+
     # ETAPE 2 : Audit Great Expectations
     print("--- ETAPE 2 : Audit de conformité (EU AI Act) ---")
     try:
@@ -5,7 +5,7 @@
 # License, or (at your option) any later version.
 
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from src.database.models import Base
 
@@ -25,6 +25,33 @@ engine = create_engine(DATABASE_URL, echo=False)
 # Créer la fabrique de sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# create_all ne modifie pas les tables existantes : les évolutions de schéma
+# sont appliquées ici sous forme d'instructions idempotentes.
+MIGRATIONS_SCHEMA = [
+    "ALTER TABLE production_quarantaine ADD COLUMN IF NOT EXISTS version_liberation VARCHAR(20)",
+    "ALTER TABLE production_quarantaine ADD COLUMN IF NOT EXISTS date_liberation TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE production_quarantaine ADD COLUMN IF NOT EXISTS motif_liberation VARCHAR(20)",
+    # ancien marquage des doublons dans erreur_log : converti en sortie de quarantaine
+    """
+    UPDATE production_quarantaine
+    SET motif_liberation = 'doublon', version_liberation = 'inconnue', date_liberation = now()
+    WHERE erreur_log = 'doublon:production_energie' AND version_liberation IS NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_quarantaine_en_attente ON production_quarantaine (id) WHERE version_liberation IS NULL",
+    """
+    DO $$ BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'registre_audit_ia' AND column_name = 'rapport_ia' AND data_type = 'json'
+        ) THEN
+            ALTER TABLE registre_audit_ia ALTER COLUMN rapport_ia TYPE JSONB USING rapport_ia::jsonb;
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_registre_audit_date ON registre_audit_ia (date_audit, id)",
+    "CREATE INDEX IF NOT EXISTS ix_registre_audit_verdict ON registre_audit_ia ((rapport_ia->>'verdict_final'))",
+]
+
 
 def initialiser_base_de_donnees():
     """
@@ -34,6 +61,9 @@ def initialiser_base_de_donnees():
     try:
         print("Initialisation du schéma de base de données...")
         Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for instruction in MIGRATIONS_SCHEMA:
+                conn.execute(text(instruction))
         print("Schéma créé avec succès.")
     except Exception as e:
         print(f"Erreur lors de la création des tables : {e}")
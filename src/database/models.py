@@ -4,7 +4,8 @@
 # published by the Free Software Foundation, either version 3 of the 
 # License, or (at your option) any later version.
 
-from sqlalchemy import Numeric, JSON ,String, DateTime, Float, Boolean, Integer, UniqueConstraint
+from sqlalchemy import Numeric, String, DateTime, Float, Boolean, Integer, UniqueConstraint, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 import datetime
 
@@ -22,7 +23,7 @@ class production_energie(Base):
     # définition des colonnes de la table
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     libelle_region: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
-    date_heure: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=False), nullable=False) #timezone=False car les données d'eco2mix sont en heure locale
+    date_heure: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=False), nullable=False) #timezone=False : horodatage stocké en UTC naïf (cf. normaliser_date_heure)
     consommation: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
     nucleaire: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
     eolien: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
@@ -44,8 +45,14 @@ class registre_audit_ia(Base):
     taux_succes: Mapped[float] = mapped_column(Float, nullable=False)
     nb_lignes_ignorees: Mapped[int] = mapped_column(Integer, nullable=False)
     conformite_statut: Mapped[bool] = mapped_column(Boolean, nullable=False)
-    # La colonne pour stocker le rapport de Mistral
-    rapport_ia: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # La colonne pour stocker le rapport de Mistral (JSONB pour pouvoir indexer le verdict)
+    rapport_ia: Mapped[dict] = mapped_column(JSONB, nullable=False)
+
+    # index pour l'historique paginé (tri par date) et le filtrage par verdict
+    __table_args__ = (
+        Index("ix_registre_audit_date", "date_audit", "id"),
+        Index("ix_registre_audit_verdict", text("(rapport_ia->>'verdict_final')")),
+    )
 
 
 class production_quarantaine(Base):
@@ -55,7 +62,7 @@ class production_quarantaine(Base):
     # définition des colonnes de la table
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     libelle_region: Mapped[str] = mapped_column(String(100), nullable=False)
-    date_heure: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=False), nullable=False) #timezone=False car les données d'eco2mix sont en heure locale
+    date_heure: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=False), nullable=False) #timezone=False : horodatage stocké en UTC naïf (cf. normaliser_date_heure)
     consommation: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
     nucleaire: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
     eolien: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
@@ -64,5 +71,35 @@ class production_quarantaine(Base):
     # nouvelle colonne pour la traçabilite de l'erreur
     erreur_log: Mapped[str] = mapped_column(String(255), nullable=True)
 
+    # traçabilité de la ré-validation : version des règles ayant libéré la ligne
+    version_liberation: Mapped[str] = mapped_column(String(20), nullable=True)
+    date_liberation: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    # 'promotion' (ligne insérée en production) ou 'doublon' (clé déjà présente, non promue)
+    motif_liberation: Mapped[str] = mapped_column(String(20), nullable=True)
+
+    # index partiel : la ré-validation ne parcourt que les lignes encore en quarantaine
+    __table_args__ = (
+        Index("ix_quarantaine_en_attente", "id", postgresql_where=text("version_liberation IS NULL")),
+    )
+
     # pas de contrainte d'unicité pour permettre l'insertion de 
     # plusieurs tentatives de données érronées si besoin
+
+
+class reference_statistique(Base):
+    # nom de la table dans la base de données
+    __tablename__ = "reference_statistique"
+
+    # accumulateurs de Welford par région, mesure et heure de la journée,
+    # mis à jour de façon incrémentale à chaque ingestion
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    libelle_region: Mapped[str] = mapped_column(String(100), nullable=False)
+    mesure: Mapped[str] = mapped_column(String(30), nullable=False)
+    heure: Mapped[int] = mapped_column(Integer, nullable=False)
+    nb_observations: Mapped[int] = mapped_column(Integer, nullable=False)
+    moyenne: Mapped[float] = mapped_column(Float, nullable=False)
+    m2: Mapped[float] = mapped_column(Float, nullable=False) # somme des carrés des écarts à la moyenne
+
+    __table_args__ = (
+        UniqueConstraint("libelle_region", "mesure", "heure", name="uq_reference_region_mesure_heure"),
+    )
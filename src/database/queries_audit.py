@@ -4,24 +4,80 @@
 # published by the Free Software Foundation, either version 3 of the 
 # License, or (at your option) any later version.
 
-from sqlalchemy import text
-import json
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from src.database.models import registre_audit_ia
+import datetime
 
-def sauvegarder_audit_final(engine, audit_id, rapport_ia):
+def inserer_rapport_audit(session: Session, digest: dict, rapport_ia: dict, nom_fichier: str):
     """
-    Persiste le verdict et le rapport de l'IA dans la base de données.
+    Insère le verdict de l'IA et les stats de Great Expectations 
+    dans la table registre_audit_ia.
     """
-    verdict = rapport_ia.get('verdict_final', 'NON DÉTERMINÉ')
-    
-    query = text("""
-        INSERT INTO registre_audit_ia (audit_id, verdict_ia, rapport_complet)
-        VALUES (:aid, :verdict, :rapport)
-    """)
-    
-    with engine.connect() as conn:
-        conn.execute(query, {
-            "aid": audit_id,
-            "verdict": verdict,
-            "rapport": json.dumps(rapport_ia)
-        })
-        conn.commit()
\ No newline at end of file
+    try:
+        # On mappe le JSON de l'IA vers le modèle SQLAlchemy
+        nouvel_audit = registre_audit_ia(
+            date_audit=datetime.datetime.now(datetime.timezone.utc),
+            nom_fichier=nom_fichier,
+            taux_succes=digest.get("taux_succes", 0.0),
+            nb_lignes_ignorees=digest.get("nb_lignes_quarantaine", 0),
+            # On convertit le verdict texte en Boolean pour la colonne conformite_statut
+            conformite_statut=(rapport_ia.get("verdict_final") == "CONFORME"),
+            # On stocke l'intégralité du JSON pour le Dashboard
+            rapport_ia=rapport_ia 
+        )
+
+        session.add(nouvel_audit)
+        session.commit()
+        print(f"✓ Rapport d'audit inséré avec succès (ID: {nouvel_audit.id})")
+        return nouvel_audit.id
+
+    except Exception as e:
+        session.rollback()
+        print(f"✗ Erreur lors de l'insertion de l'audit : {e}")
+        raise e
+
+
+def lister_historique_audits(conn, taille_page=20, curseur=None, verdict=None, date_debut=None, date_fin=None, inclure_rapport=False):
+    """
+    Retourne une page de l'historique des audits, du plus récent au plus ancien.
+    La pagination se fait par clé (date_audit, id) : `curseur` est le couple renvoyé
+    pour la page précédente, ce qui évite un OFFSET dont le coût croît avec l'historique.
+    Le rapport JSONB complet n'est lu que si `inclure_rapport` est vrai.
+    Retourne (liste de dictionnaires, curseur de la page suivante ou None).
+    """
+    verdict_final = registre_audit_ia.rapport_ia["verdict_final"].astext
+
+    colonnes = [
+        registre_audit_ia.id,
+        registre_audit_ia.date_audit,
+        registre_audit_ia.nom_fichier,
+        registre_audit_ia.taux_succes,
+        registre_audit_ia.nb_lignes_ignorees,
+        registre_audit_ia.conformite_statut,
+        verdict_final.label("verdict_final"),
+    ]
+    if inclure_rapport:
+        colonnes.append(registre_audit_ia.rapport_ia)
+
+    requete = select(*colonnes)
+
+    if verdict is not None:
+        requete = requete.where(verdict_final == verdict)
+    if date_debut is not None:
+        requete = requete.where(registre_audit_ia.date_audit >= date_debut)
+    if date_fin is not None:
+        requete = requete.where(registre_audit_ia.date_audit < date_fin)
+    if curseur is not None:
+        requete = requete.where(tuple_(registre_audit_ia.date_audit, registre_audit_ia.id) < tuple_(*curseur))
+
+    # On lit une ligne de plus pour savoir s'il existe une page suivante
+    requete = requete.order_by(registre_audit_ia.date_audit.desc(), registre_audit_ia.id.desc()).limit(taille_page + 1)
+    lignes = [dict(ligne._mapping) for ligne in conn.execute(requete)]
+
+    curseur_suivant = None
+    if len(lignes) > taille_page:
+        lignes = lignes[:taille_page]
+        curseur_suivant = (lignes[-1]["date_audit"], lignes[-1]["id"])
+
+    return lignes, curseur_suivant
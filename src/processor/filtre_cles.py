@@ -0,0 +1,116 @@
+# Copyright (C) 2026 Francisco CABRERA HERRE
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+import os
+import pandas as pd
+from sqlalchemy import select
+from src.database.models import production_energie, production_quarantaine
+from src.database.database_setup import SessionLocal
+
+
+def normaliser_date_heure(serie_dates):
+    """
+    Convertit les horodatages ISO 8601 d'éCO2mix (ex: '2025-01-01T00:00:00+01:00')
+    en heure UTC naïve, telle que stockée dans production_energie (timezone=False).
+    L'UTC rend la valeur stockée indépendante du fuseau de la session PostgreSQL et
+    évite l'heure en double du passage à l'heure d'hiver. Les valeurs déjà naïves
+    (relues en base) sont considérées comme UTC et restent inchangées.
+    """
+    return pd.to_datetime(serie_dates, utc=True, errors='coerce').dt.tz_localize(None)
+
+
+COLONNES_MESURES = ["consommation", "nucleaire", "eolien", "solaire"]
+
+
+def construire_index_cles(date_min, date_max):
+    """
+    Construit un index compact en mémoire des clés déjà ingérées sur la fenêtre
+    [date_min, date_max] couverte par le fichier téléchargé :
+    - production : région -> ensemble des date_heure présentes ;
+    - quarantaine en attente : ensemble des (région, date_heure, mesures...). Les
+      mesures sont conservées pour ne retirer que les lignes re-téléchargées à
+      l'identique : une correction publiée par RTE doit pouvoir être ingérée.
+    """
+    db = SessionLocal()
+    try:
+        requete_production = (
+            select(production_energie.libelle_region, production_energie.date_heure)
+            .where(production_energie.date_heure.between(date_min, date_max))
+        )
+        index_production = {}
+        for region, date_heure in db.execute(requete_production):
+            index_production.setdefault(region, set()).add(pd.Timestamp(date_heure))
+
+        requete_quarantaine = (
+            select(
+                production_quarantaine.libelle_region, production_quarantaine.date_heure,
+                *[getattr(production_quarantaine, col) for col in COLONNES_MESURES]
+            )
+            .where(production_quarantaine.version_liberation.is_(None))
+            .where(production_quarantaine.date_heure.between(date_min, date_max))
+        )
+        index_quarantaine = {
+            (region, pd.Timestamp(date_heure), *[round(float(v), 2) for v in valeurs])
+            for region, date_heure, *valeurs in db.execute(requete_quarantaine)
+        }
+        return index_production, index_quarantaine
+    finally:
+        db.close()
+
+
+def filtrer_cles_deja_ingerees(chemin_csv=None):
+    """
+    Retire du fichier téléchargé les lignes (libelle_region, date_heure) déjà présentes
+    en production, ou en quarantaine avec des mesures identiques, avant l'audit
+    Great Expectations et l'ingestion SQL.
+    Retourne le nombre de lignes conservées, ou None si le fichier est introuvable.
+    """
+    if chemin_csv is None:
+        chemin_csv = os.path.join("/app", "data", "delta_update.csv")
+
+    if not os.path.exists(chemin_csv):
+        print(f"Erreur : Fichier introuvable : {chemin_csv}")
+        return None
+
+    # Lecture en texte pour réécrire le fichier à l'identique (format des dates, etc.)
+    df = pd.read_csv(chemin_csv, sep=';', dtype=str, keep_default_na=False)
+    if df.empty:
+        return 0
+
+    dates_utc = normaliser_date_heure(df['date_heure'])
+    if dates_utc.isna().all():
+        # Aucune date exploitable : on laisse l'audit qualité signaler le problème
+        return len(df)
+
+    index_production, index_quarantaine = construire_index_cles(dates_utc.min(), dates_utc.max())
+
+    deja_ingeree = pd.Series(False, index=df.index)
+    for region, dates_connues in index_production.items():
+        masque_region = df['libelle_region'] == region
+        deja_ingeree |= masque_region & dates_utc.isin(dates_connues)
+
+    if index_quarantaine:
+        # Mesures arrondies comme en base (Numeric(10,2)), valeurs absentes à 0 comme à l'ingestion
+        mesures = df[COLONNES_MESURES].apply(pd.to_numeric, errors='coerce').fillna(0).round(2)
+        deja_ingeree |= pd.Series(
+            [
+                (region, date_heure, *valeurs) in index_quarantaine
+                for region, date_heure, valeurs in zip(df['libelle_region'], dates_utc, mesures.itertuples(index=False))
+            ],
+            index=df.index, dtype=bool
+        )
+
+    nb_retirees = int(deja_ingeree.sum())
+    if nb_retirees:
+        df = df[~deja_ingeree]
+        df.to_csv(chemin_csv, sep=';', index=False)
+
+    print(f"Filtrage : {nb_retirees} lignes déjà en base retirées, {len(df)} lignes conservées.")
+    return len(df)
+
+
+if __name__ == "__main__":
+    filtrer_cles_deja_ingerees()
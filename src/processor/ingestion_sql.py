@@ -10,31 +10,49 @@ from sqlalchemy.dialects.postgresql import insert
 from tqdm import tqdm
 from src.database.models import production_energie, production_quarantaine, registre_audit_ia
 from src.database.database_setup import SessionLocal
+from src.processor.init_qualite import identifiant_regle
+from src.processor.filtre_cles import normaliser_date_heure
+from src.processor.references_statistiques import detecter_anomalies_statistiques, mettre_a_jour_references, est_rejet_zscore_seul
 
 
 def executer_ingestion_systeme(df, resultat_audit, nom_fichier):
     db = SessionLocal()
     
-    # Identification des indices des lignes en erreur
-    indices_erreurs = set()
+    # Identification des indices des lignes en erreur et des règles échouées
+    # (les règles sont conservées dans erreur_log pour la ré-validation ciblée)
+    indices_erreurs = {}
     for res in resultat_audit.results:
         if not res.success:
-            indices = res.result.get('unexpected_index_list', [])
-            indices_erreurs.update(indices)
+            regle = identifiant_regle(res.expectation_config)
+            for indice in res.result.get('unexpected_index_list', []):
+                indices_erreurs.setdefault(indice, set()).add(regle)
     
-    df = df.drop_duplicates(subset=['libelle_region', 'date_heure'], keep='first').reset_index(drop=True)
+    # L'index d'origine est conservé pour rester aligné avec les indices remontés par Great Expectations
+    df = df.drop_duplicates(subset=['libelle_region', 'date_heure'], keep='first')
     
     print(f"Finalisation : Traitement de {len(df)} lignes...")
 
+    # Horodatages stockés en UTC naïf, même base de temps que le filtrage des clés
+    dates_utc = normaliser_date_heure(df['date_heure'])
+
     # On crée deux listes pour accumuler les records au lieu d'insérer 1 par 1
     records_propres = []
     records_quarantaine = []
+    # Lignes réellement insérées (valeurs renvoyées par la base) qui alimentent les
+    # références statistiques : lignes validées et rejets purement statistiques
+    colonnes_references = ['libelle_region', 'date_heure', 'consommation', 'nucleaire', 'eolien', 'solaire']
+    lignes_references = []
 
     try:
+        # Règles dynamiques : écart aux références statistiques par région, mesure et heure
+        for regle, masque in detecter_anomalies_statistiques(db, df).items():
+            for indice in df.index[masque]:
+                indices_erreurs.setdefault(indice, set()).add(regle)
+
         for index, row in tqdm(df.iterrows(), total=len(df), desc="Préparation des données"):
             data_fields = {
                 "libelle_region": str(row['libelle_region']),
-                "date_heure": pd.to_datetime(row['date_heure']),
+                "date_heure": dates_utc[index].to_pydatetime() if pd.notnull(dates_utc[index]) else None,
                 "consommation": float(row['consommation']) if pd.notnull(row['consommation']) else 0,
                 "nucleaire": float(row['nucleaire']) if pd.notnull(row['nucleaire']) else 0,
                 "eolien": float(row['eolien']) if pd.notnull(row['eolien']) else 0,
@@ -42,7 +60,7 @@ def executer_ingestion_systeme(df, resultat_audit, nom_fichier):
             }
 
             if index in indices_erreurs:
-                data_fields["erreur_log"] = "Échec validation audit"
+                data_fields["erreur_log"] = ",".join(sorted(indices_erreurs[index]))[:255]
                 records_quarantaine.append(data_fields)
             else:
                 records_propres.append(data_fields)
@@ -52,12 +70,28 @@ def executer_ingestion_systeme(df, resultat_audit, nom_fichier):
             print(f"Envoi de {len(records_propres)} lignes vers la table de production...")
             stmt = insert(production_energie).values(records_propres)
             stmt = stmt.on_conflict_do_nothing(index_elements=['libelle_region', 'date_heure'])
-            db.execute(stmt)
+            # Seules les lignes réellement insérées alimentent les références statistiques
+            stmt = stmt.returning(
+                production_energie.libelle_region, production_energie.date_heure,
+                production_energie.consommation, production_energie.nucleaire,
+                production_energie.eolien, production_energie.solaire
+            )
+            lignes_references.extend(db.execute(stmt).all())
 
         if records_quarantaine:
             print(f"Envoi de {len(records_quarantaine)} lignes vers la quarantaine...")
             stmt_q = insert(production_quarantaine).values(records_quarantaine)
-            db.execute(stmt_q)
+            stmt_q = stmt_q.returning(
+                production_quarantaine.libelle_region, production_quarantaine.date_heure,
+                production_quarantaine.consommation, production_quarantaine.nucleaire,
+                production_quarantaine.eolien, production_quarantaine.solaire,
+                production_quarantaine.erreur_log
+            )
+            for ligne in db.execute(stmt_q).all():
+                if est_rejet_zscore_seul(set(ligne.erreur_log.split(","))):
+                    lignes_references.append(ligne[:-1])
+
+        mettre_a_jour_references(db, pd.DataFrame(lignes_references, columns=colonnes_references))
 
         print("Finalisation de la transaction SQL...")
         db.commit()
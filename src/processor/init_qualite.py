@@ -10,6 +10,40 @@ import os
 import sys
 
 
+# Version du jeu de règles : à incrémenter à chaque modification d'un seuil
+# afin de tracer quelle version a libéré une ligne de la quarantaine.
+VERSION_REGLES = "2026.1"
+
+# Colonnes dont l'absence de valeur rend la ligne inexploitable
+COLONNES_NON_NULLES = ["date_heure", "libelle_region"]
+
+# Seuils de cohérence physique (MW) : colonne -> (min, max)
+# Note : historiquement, la consommation maximale observée pour une région donnée est d'environ 14000-15000 MW, mais nous appliquons une marge de sécurité pour détecter les anomalies grossières (ex: 25000 MW serait clairement anormal pour une région française).
+# Les seuils pour le nucléaire, l'éolien et le solaire sont basés sur les capacités de production maximales historiques par région, avec une marge de sécurité pour détecter les anomalies.
+SEUILS_PHYSIQUES = {
+    "consommation": (0, 25000),
+    "nucleaire": (0, 15000),
+    "eolien": (0, 10000),
+    "solaire": (0, 8000),
+}
+
+
+def identifiant_regle(expectation_config):
+    """
+    Construit un identifiant court et stable pour une règle Great Expectations
+    (ex: 'bornes:consommation'), stocké dans erreur_log pour la quarantaine.
+    """
+    prefixes = {
+        "expect_column_to_exist": "existence",
+        "expect_column_values_to_not_be_null": "non_nul",
+        "expect_column_values_to_be_between": "bornes",
+        "expect_column_values_to_match_regex": "format",
+    }
+    type_regle = expectation_config.type
+    colonne = expectation_config.kwargs.get('column')
+    return f"{prefixes.get(type_regle, type_regle)}:{colonne}"
+
+
 def initialiser_audit_qualite(chemin_csv=None):
     """
     Initialisation de la validation de la qualité des données avec Great Expectations.
@@ -58,34 +92,18 @@ def initialiser_audit_qualite(chemin_csv=None):
 
     # 2- Completude (données manquantes)
     # Ex: une donnée sans date ou localisation n'est pas exploitable
-    suite.add_expectation(gx.expectations.ExpectColumnValuesToNotBeNull(column="date_heure"))
-    suite.add_expectation(gx.expectations.ExpectColumnValuesToNotBeNull(column="libelle_region"))
+    for col in COLONNES_NON_NULLES:
+        suite.add_expectation(gx.expectations.ExpectColumnValuesToNotBeNull(column=col))
     
     # 3- Cohérence physique et données aberrantes
     # Ex: une consommation négative est un indicateur d'erreur
-    suite.add_expectation(gx.expectations.ExpectColumnValuesToBeBetween(
-        column="consommation", 
-        min_value=0, 
-        max_value=25000  
-        # Seuil base sur les records historiques par region
-        # Note : historiquement, la consommation maximale observée pour une région donnée est d'environ 14000-15000 MW, mais nous appliquons une marge de sécurité pour détecter les anomalies grossières (ex: 25000 MW serait clairement anormal pour une région française).
-    ))
-    suite.add_expectation(gx.expectations.ExpectColumnValuesToBeBetween(
-        column="nucleaire", 
-        min_value=0, 
-        max_value=15000
-    ))
-    suite.add_expectation(gx.expectations.ExpectColumnValuesToBeBetween(
-        column="eolien", 
-        min_value=0, 
-        max_value=10000
-    ))
-    suite.add_expectation(gx.expectations.ExpectColumnValuesToBeBetween(
-        column="solaire", 
-        min_value=0, 
-        max_value=8000
-    ))
-    # Note : les seuils pour le nucléaire, l'éolien et le solaire sont basés sur les capacités de production maximales historiques par région, avec une marge de sécurité pour détecter les anomalies.
+    # Les seuils sont centralisés dans SEUILS_PHYSIQUES pour être partagés avec la ré-validation de la quarantaine
+    for col, (seuil_min, seuil_max) in SEUILS_PHYSIQUES.items():
+        suite.add_expectation(gx.expectations.ExpectColumnValuesToBeBetween(
+            column=col, 
+            min_value=seuil_min, 
+            max_value=seuil_max
+        ))
 
     # 4. Formatage Temporel (Standard ISO 8601)
     suite.add_expectation(gx.expectations.ExpectColumnValuesToMatchRegex(
@@ -0,0 +1,186 @@
+# Copyright (C) 2026 Francisco CABRERA HERRE
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+import datetime
+import operator
+import sys
+from functools import reduce
+import pandas as pd
+from sqlalchemy import select, update, or_
+from sqlalchemy.dialects.postgresql import insert
+from src.database.models import production_energie, production_quarantaine
+from src.database.database_setup import SessionLocal
+from src.processor.init_qualite import VERSION_REGLES, SEUILS_PHYSIQUES
+from src.processor.references_statistiques import detecter_anomalies_statistiques, mettre_a_jour_references, est_rejet_zscore_seul
+
+
+TAILLE_LOT = 5000
+
+# Libellé utilisé avant la traçabilité par règle : toutes les règles sont alors ré-évaluées
+MESSAGE_HERITE = "Échec validation audit"
+
+# Motifs de sortie de quarantaine (colonne motif_liberation) : ligne promue vers
+# production_energie, ou ligne valide dont la clé y était déjà présente (non promue)
+MOTIF_PROMOTION = "promotion"
+MOTIF_DOUBLON = "doublon"
+
+COLONNES_MESURES = list(SEUILS_PHYSIQUES.keys())
+
+
+def calculer_masques_echec(db, df):
+    """
+    Évalue de façon vectorisée les règles ré-évaluables sur des lignes déjà en base,
+    y compris les règles statistiques avec les références à jour.
+    Les règles non_nul ne le sont pas : une région absente est stockée sous la
+    chaîne 'nan' et ne peut plus être distinguée d'une valeur réelle.
+    Retourne un dictionnaire identifiant de règle -> masque booléen des lignes en échec.
+    """
+    masques = detecter_anomalies_statistiques(db, df)
+    for col, (seuil_min, seuil_max) in SEUILS_PHYSIQUES.items():
+        masques[f"bornes:{col}"] = ~df[col].between(seuil_min, seuil_max)
+    return masques
+
+
+def lignes_liberables(db, df):
+    """
+    Détermine les lignes de quarantaine qui passent désormais toutes les règles
+    ré-évaluables en vigueur (un seuil resserré peut rejeter une ligne qui n'avait
+    échoué qu'à une autre règle). Une règle non ré-évaluable depuis la base
+    (ex: format de la date d'origine, valeur absente) maintient la ligne en quarantaine.
+    """
+    masques = calculer_masques_echec(db, df)
+    regles_par_ligne = df['erreur_log'].fillna(MESSAGE_HERITE).map(
+        lambda log: set(masques) if log == MESSAGE_HERITE else set(log.split(","))
+    )
+
+    encore_en_echec = reduce(operator.or_, masques.values())
+
+    non_reevaluable = regles_par_ligne.map(lambda regles: bool(regles - set(masques)))
+
+    # Lignes héritées (règles inconnues) : une région absente à l'ingestion a été stockée 'nan'
+    region_absente = df['libelle_region'].isna() | df['libelle_region'].isin(["nan", ""])
+    return ~(encore_en_echec | non_reevaluable | region_absente)
+
+
+def executer_reaudit_quarantaine(regles=None, taille_lot=TAILLE_LOT):
+    """
+    Ré-valide les lignes de production_quarantaine par lots et promeut celles
+    qui passent désormais vers production_energie (mêmes règles de conflit que
+    l'ingestion). Si `regles` est fourni (ex: ['bornes:consommation']), seules les
+    lignes ayant échoué à l'une de ces règles sont relues.
+    Les lignes valides dont la clé existe déjà en production ne sont pas promues :
+    elles sortent de la quarantaine avec le motif MOTIF_DOUBLON, erreur_log est conservé.
+    """
+    db = SessionLocal()
+    dernier_id = 0
+    total_relues = 0
+    total_liberees = 0
+    total_doublons = 0
+
+    colonnes = [
+        production_quarantaine.id,
+        production_quarantaine.libelle_region,
+        production_quarantaine.date_heure,
+        production_quarantaine.erreur_log,
+    ] + [getattr(production_quarantaine, col) for col in COLONNES_MESURES]
+
+    filtre_regles = None
+    if regles:
+        filtre_regles = or_(
+            production_quarantaine.erreur_log.is_(None),
+            production_quarantaine.erreur_log == MESSAGE_HERITE,
+            *[production_quarantaine.erreur_log.contains(regle) for regle in regles]
+        )
+
+    print(f"Ré-audit de la quarantaine avec les règles version {VERSION_REGLES}...")
+
+    try:
+        while True:
+            # Pagination par clé (id) : le coût dépend du volume en quarantaine, pas de l'historique
+            requete = (
+                select(*colonnes)
+                .where(production_quarantaine.version_liberation.is_(None))
+                .where(production_quarantaine.id > dernier_id)
+                .order_by(production_quarantaine.id)
+                .limit(taille_lot)
+            )
+            if filtre_regles is not None:
+                requete = requete.where(filtre_regles)
+
+            lignes = db.execute(requete).all()
+            if not lignes:
+                break
+
+            df = pd.DataFrame(lignes, columns=[c.key for c in colonnes])
+            for col in COLONNES_MESURES:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+
+            dernier_id = int(df['id'].max())
+            total_relues += len(df)
+
+            df_liberees = df[lignes_liberables(db, df)]
+            if df_liberees.empty:
+                continue
+
+            # Une seule ligne candidate par clé : les autres sont des doublons de cette ligne
+            cles = ['libelle_region', 'date_heure']
+            df_candidates = df_liberees.drop_duplicates(subset=cles, keep='first')
+
+            records = df_candidates[cles + COLONNES_MESURES].to_dict(orient='records')
+            stmt = insert(production_energie).values(records)
+            stmt = stmt.on_conflict_do_nothing(index_elements=cles)
+            stmt = stmt.returning(
+                production_energie.libelle_region, production_energie.date_heure,
+                *[getattr(production_energie, col) for col in COLONNES_MESURES]
+            )
+            lignes_inserees = db.execute(stmt).all()
+
+            # Les clés renvoyées par RETURNING distinguent les lignes promues des doublons
+            cles_inserees = {(ligne[0], pd.Timestamp(ligne[1])) for ligne in lignes_inserees}
+            est_inseree = pd.Series(
+                [(r, pd.Timestamp(d)) in cles_inserees for r, d in zip(df_candidates['libelle_region'], df_candidates['date_heure'])],
+                index=df_candidates.index, dtype=bool
+            )
+
+            # Les rejets purement statistiques ont déjà alimenté les références à l'ingestion
+            deja_comptee = df_candidates['erreur_log'].fillna(MESSAGE_HERITE).map(
+                lambda log: est_rejet_zscore_seul(set(log.split(",")))
+            )
+            mettre_a_jour_references(db, df_candidates.loc[est_inseree & ~deja_comptee, cles + COLONNES_MESURES])
+            ids_promus = df_candidates.loc[est_inseree, 'id'].tolist()
+            ids_doublons = df_liberees.loc[~df_liberees['id'].isin(ids_promus), 'id'].tolist()
+
+            maintenant = datetime.datetime.now(datetime.timezone.utc)
+            for ids, motif in [(ids_promus, MOTIF_PROMOTION), (ids_doublons, MOTIF_DOUBLON)]:
+                if ids:
+                    db.execute(
+                        update(production_quarantaine)
+                        .where(production_quarantaine.id.in_(ids))
+                        .values(
+                            version_liberation=VERSION_REGLES,
+                            date_liberation=maintenant,
+                            motif_liberation=motif
+                        )
+                    )
+            db.commit()
+            total_liberees += len(ids_promus)
+            total_doublons += len(ids_doublons)
+            print(f"Lot jusqu'à l'id {dernier_id} : {len(ids_promus)} lignes libérées, {len(ids_doublons)} doublons.")
+
+        print(f"Succès : {total_relues} lignes relues, {total_liberees} libérées de la quarantaine, {total_doublons} doublons déjà en production.")
+        return total_liberees
+
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors du ré-audit : {e}")
+        raise e
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.processor.reaudit_quarantaine [bornes:consommation ...]
+    executer_reaudit_quarantaine(regles=sys.argv[1:] or None)
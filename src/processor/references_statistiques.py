@@ -0,0 +1,197 @@
+# Copyright (C) 2026 Francisco CABRERA HERRE
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text, func, cast, Float
+from sqlalchemy.dialects.postgresql import insert
+from src.database.models import reference_statistique
+from src.database.database_setup import engine
+from src.processor.init_qualite import SEUILS_PHYSIQUES
+from src.processor.filtre_cles import normaliser_date_heure
+
+
+COLONNES_MESURES = list(SEUILS_PHYSIQUES.keys())
+CLES_REFERENCE = ["libelle_region", "mesure", "heure"]
+
+# Écart au comportement habituel (en nombre d'écarts-types) au-delà duquel la ligne part en quarantaine
+SEUIL_ZSCORE = 6.0
+# Nombre minimal d'observations avant d'activer la règle pour une région/mesure/heure
+NB_MIN_OBSERVATIONS = 30
+# Plancher d'écart-type (MW) : évite qu'une série quasi constante (ex: solaire la nuit) rende tout écart infini
+ECART_TYPE_MIN = 50.0
+# Fenêtre glissante : poids maximal de l'historique lors d'une fusion (~90 jours à 4 mesures par heure).
+# Au-delà, l'historique est ramené à ce poids, pour que la référence suive un changement durable
+# (arrêt prolongé d'un réacteur, nouvelle capacité solaire).
+NB_MAX_OBSERVATIONS = 360
+# Profondeur de l'historique relu lors de la reconstruction des références
+JOURS_HISTORIQUE = 90
+# Fuseau des références horaires : le profil journalier (ex: solaire) suit l'heure légale française
+FUSEAU_HORAIRE = "Europe/Paris"
+
+
+def heure_du_jour(serie_dates):
+    """
+    Heure légale (0-23) dérivée de l'horodatage normalisé en UTC, que la valeur
+    provienne du CSV (avec décalage) ou de la base (UTC naïf) : une même mesure
+    tombe toujours dans la même case horaire.
+    """
+    return normaliser_date_heure(serie_dates).dt.tz_localize("UTC").dt.tz_convert(FUSEAU_HORAIRE).dt.hour
+
+
+def est_rejet_zscore_seul(regles):
+    """
+    Indique si une ligne n'a échoué qu'aux règles statistiques. Ces lignes, plausibles
+    physiquement, alimentent tout de même les références : sans cela un changement
+    durable resterait indéfiniment en quarantaine.
+    """
+    return bool(regles) and all(regle.startswith("zscore:") for regle in regles)
+
+
+def charger_references(db, regions):
+    """
+    Charge les accumulateurs statistiques des régions concernées par le lot
+    (au plus 4 mesures x 24 heures par région, indépendamment de l'historique).
+    """
+    requete = (
+        select(
+            reference_statistique.libelle_region,
+            reference_statistique.mesure,
+            reference_statistique.heure,
+            reference_statistique.nb_observations,
+            reference_statistique.moyenne,
+            reference_statistique.m2,
+        )
+        .where(reference_statistique.libelle_region.in_([str(r) for r in regions]))
+    )
+    return pd.DataFrame(
+        db.execute(requete).all(),
+        columns=CLES_REFERENCE + ["nb_observations", "moyenne", "m2"]
+    )
+
+
+def detecter_anomalies_statistiques(db, df):
+    """
+    Compare de façon vectorisée chaque mesure du lot à sa référence horaire
+    (z-score par région, mesure et heure de la journée).
+    Retourne un dictionnaire identifiant de règle -> masque booléen des lignes en échec.
+    """
+    references = charger_references(db, df['libelle_region'].unique())
+    cles = pd.MultiIndex.from_arrays([
+        df['libelle_region'].astype(str),
+        heure_du_jour(df['date_heure']).fillna(-1).astype(int),
+    ])
+
+    masques = {}
+    for mesure in COLONNES_MESURES:
+        reference = (
+            references[references['mesure'] == mesure]
+            .set_index(["libelle_region", "heure"])
+            .reindex(cles)
+        )
+        nb = reference['nb_observations'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ecart_type = np.sqrt(reference['m2'].to_numpy(dtype=float) / (nb - 1))
+        ecart_type = np.fmax(ecart_type, ECART_TYPE_MIN)
+        valeurs = pd.to_numeric(df[mesure], errors='coerce').to_numpy(dtype=float)
+        zscore = np.abs(valeurs - reference['moyenne'].to_numpy(dtype=float)) / ecart_type
+
+        masques[f"zscore:{mesure}"] = pd.Series(
+            (nb >= NB_MIN_OBSERVATIONS) & (zscore > SEUIL_ZSCORE), index=df.index
+        )
+    return masques
+
+
+def mettre_a_jour_references(db, df):
+    """
+    Intègre un lot dans les accumulateurs (fusion de Welford/Chan entre la
+    référence existante et les statistiques du lot). La fusion est calculée par
+    PostgreSQL dans l'upsert, sous le verrou de la ligne : ingestion et ré-audit
+    concurrents ne peuvent pas s'écraser mutuellement. Le poids de l'historique est
+    plafonné à NB_MAX_OBSERVATIONS (fenêtre glissante).
+    Ne commit pas : la mise à jour fait partie de la transaction appelante.
+    """
+    if df.empty:
+        return
+
+    df_long = df.assign(heure=heure_du_jour(df['date_heure'])).melt(
+        id_vars=["libelle_region", "heure"], value_vars=COLONNES_MESURES,
+        var_name="mesure", value_name="valeur"
+    )
+    df_long['valeur'] = pd.to_numeric(df_long['valeur'], errors='coerce')
+    df_long = df_long.dropna(subset=["heure", "valeur"])
+    if df_long.empty:
+        return
+    df_long['heure'] = df_long['heure'].astype(int)
+
+    lot = df_long.groupby(CLES_REFERENCE)['valeur'].agg(n_b="count", moyenne_b="mean", variance_b="var")
+    lot['m2_b'] = lot['variance_b'].fillna(0) * (lot['n_b'] - 1)
+
+    records = [
+        {
+            "libelle_region": str(region),
+            "mesure": mesure,
+            "heure": int(heure),
+            "nb_observations": int(r.n_b),
+            "moyenne": float(r.moyenne_b),
+            "m2": float(r.m2_b),
+        }
+        for (region, mesure, heure), r in lot.iterrows()
+    ]
+
+    stmt = insert(reference_statistique).values(records)
+    lot_b = stmt.excluded
+
+    # Historique ramené à la fenêtre glissante (m2 réduit dans la même proportion)
+    n_a = func.least(reference_statistique.nb_observations, NB_MAX_OBSERVATIONS)
+    n_a_f = cast(n_a, Float)
+    n_b_f = cast(lot_b.nb_observations, Float)
+    m2_a = reference_statistique.m2 * n_a_f / cast(reference_statistique.nb_observations, Float)
+    n = n_a_f + n_b_f
+    delta = lot_b.moyenne - reference_statistique.moyenne
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=CLES_REFERENCE,
+        set_={
+            "nb_observations": n_a + lot_b.nb_observations,
+            "moyenne": reference_statistique.moyenne + delta * n_b_f / n,
+            "m2": m2_a + lot_b.m2 + delta * delta * n_a_f * n_b_f / n,
+        }
+    )
+    db.execute(stmt)
+
+
+def reconstruire_references(jours=JOURS_HISTORIQUE):
+    """
+    Reconstruit les références à partir des JOURS_HISTORIQUE derniers jours de
+    production_energie. À lancer une fois sur une base existante (sinon la règle
+    reste inactive tant que NB_MIN_OBSERVATIONS n'est pas atteint), ou après une
+    modification des paramètres de la fenêtre.
+    """
+    valeurs = ", ".join(f"('{col}', p.{col}::float8)" for col in COLONNES_MESURES)
+    requete = text(f"""
+        INSERT INTO reference_statistique (libelle_region, mesure, heure, nb_observations, moyenne, m2)
+        SELECT p.libelle_region, m.mesure,
+               EXTRACT(HOUR FROM (p.date_heure AT TIME ZONE 'UTC') AT TIME ZONE '{FUSEAU_HORAIRE}')::int,
+               COUNT(m.valeur), AVG(m.valeur), COALESCE(VAR_POP(m.valeur) * COUNT(m.valeur), 0)
+        FROM production_energie p
+        CROSS JOIN LATERAL (VALUES {valeurs}) AS m(mesure, valeur)
+        WHERE p.date_heure >= (SELECT MAX(date_heure) FROM production_energie) - make_interval(days => :jours)
+          AND m.valeur IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+    print(f"Reconstruction des références statistiques sur {jours} jours d'historique...")
+    with engine.begin() as conn:
+        # Verrou exclusif : aucune ingestion ne doit fusionner pendant la reconstruction
+        conn.execute(text("LOCK TABLE reference_statistique IN EXCLUSIVE MODE"))
+        conn.execute(text("DELETE FROM reference_statistique"))
+        nb = conn.execute(requete, {"jours": jours}).rowcount
+    print(f"Succès : {nb} références reconstruites.")
+
+
+if __name__ == "__main__":
+    reconstruire_references()
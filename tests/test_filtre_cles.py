@@ -0,0 +1,101 @@
+import os
+import types
+import pandas as pd
+import psycopg2.extensions
+import pytest
+from src.processor import filtre_cles
+from src.processor.filtre_cles import normaliser_date_heure, filtrer_cles_deja_ingerees
+
+COLONNES = ["libelle_region", "date_heure", "consommation", "nucleaire", "eolien", "solaire"]
+LIGNES = [
+    ["Bretagne", "2025-01-01T00:00:00+01:00", "2500", "0", "300", "0"],
+    ["Bretagne", "2025-07-01T12:00:00+02:00", "2100", "0", "150", "900"],
+    # passage à l'heure d'hiver : même heure locale, deux instants distincts
+    ["Bretagne", "2025-10-26T02:00:00+02:00", "2000", "0", "200", "0"],
+    ["Bretagne", "2025-10-26T02:00:00+01:00", "2000", "0", "200", "0"],
+]
+
+
+def ecrire_csv(chemin, lignes):
+    pd.DataFrame(lignes, columns=COLONNES).to_csv(chemin, sep=';', index=False)
+
+
+def test_normalisation_en_utc_naif():
+    dates = normaliser_date_heure(pd.Series([ligne[1] for ligne in LIGNES]))
+    assert list(dates) == [
+        pd.Timestamp("2024-12-31 23:00:00"),
+        pd.Timestamp("2025-07-01 10:00:00"),
+        pd.Timestamp("2025-10-26 00:00:00"),
+        pd.Timestamp("2025-10-26 01:00:00"),
+    ]
+    # Une valeur relue en base (naïve) est inchangée
+    assert normaliser_date_heure(pd.Series([dates[0].to_pydatetime()]))[0] == dates[0]
+
+
+def test_valeur_envoyee_sans_decalage():
+    # La valeur passée à psycopg2 est naïve : le fuseau de la session n'intervient pas
+    valeur = normaliser_date_heure(pd.Series([LIGNES[0][1]]))[0].to_pydatetime()
+    rendu = psycopg2.extensions.adapt(valeur).getquoted().decode()
+    assert rendu == "'2024-12-31T23:00:00'::timestamp"
+
+
+def test_filtre_retire_les_cles_stockees(tmp_path, monkeypatch):
+    chemin = tmp_path / "delta_update.csv"
+    ecrire_csv(chemin, LIGNES)
+    stockees = normaliser_date_heure(pd.Series([LIGNES[0][1], LIGNES[2][1]]))
+    monkeypatch.setattr(
+        filtre_cles, "construire_index_cles",
+        lambda date_min, date_max: ({"Bretagne": set(stockees)}, set())
+    )
+
+    assert filtrer_cles_deja_ingerees(str(chemin)) == 2
+    restantes = pd.read_csv(chemin, sep=';', dtype=str)
+    assert list(restantes['date_heure']) == [LIGNES[1][1], LIGNES[3][1]]
+
+
+def test_filtre_quarantaine_seulement_si_mesures_identiques(tmp_path, monkeypatch):
+    chemin = tmp_path / "delta_update.csv"
+    ecrire_csv(chemin, LIGNES[:2])
+    dates = normaliser_date_heure(pd.Series([LIGNES[0][1], LIGNES[1][1]]))
+    index_quarantaine = {
+        # re-téléchargée à l'identique : retirée
+        ("Bretagne", dates[0], 2500.0, 0.0, 300.0, 0.0),
+        # corrigée par RTE depuis la mise en quarantaine (solaire 900 au lieu de 9000) : conservée
+        ("Bretagne", dates[1], 2100.0, 0.0, 150.0, 9000.0),
+    }
+    monkeypatch.setattr(
+        filtre_cles, "construire_index_cles",
+        lambda date_min, date_max: ({}, index_quarantaine)
+    )
+
+    assert filtrer_cles_deja_ingerees(str(chemin)) == 1
+    restantes = pd.read_csv(chemin, sep=';', dtype=str)
+    assert list(restantes['date_heure']) == [LIGNES[1][1]]
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL non définie")
+def test_aller_retour_insertion_puis_filtre(tmp_path):
+    pytest.importorskip("great_expectations")
+    from sqlalchemy import text
+    from src.database.database_setup import engine, initialiser_base_de_donnees
+    from src.processor.ingestion_sql import executer_ingestion_systeme
+
+    region = "Région de test"
+    lignes = [[region] + ligne[1:] for ligne in LIGNES]
+    chemin = tmp_path / "delta_update.csv"
+    ecrire_csv(chemin, lignes)
+
+    initialiser_base_de_donnees()
+    try:
+        df = pd.read_csv(chemin, sep=';')
+        executer_ingestion_systeme(df, types.SimpleNamespace(results=[]), nom_fichier="test.csv")
+
+        # Les quatre lignes (y compris l'heure en double) sont stockées puis reconnues par le filtre
+        with engine.connect() as conn:
+            nb = conn.execute(text("SELECT count(*) FROM production_energie WHERE libelle_region = :r"), {"r": region}).scalar()
+        assert nb == 4
+        assert filtrer_cles_deja_ingerees(str(chemin)) == 0
+    finally:
+        with engine.begin() as conn:
+            for table in ["production_energie", "production_quarantaine", "reference_statistique"]:
+                conn.execute(text(f"DELETE FROM {table} WHERE libelle_region = :r"), {"r": region})
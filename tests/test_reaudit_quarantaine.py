@@ -0,0 +1,27 @@
+import pandas as pd
+from src.processor import reaudit_quarantaine
+from src.processor.reaudit_quarantaine import lignes_liberables
+
+
+def test_lignes_liberables(monkeypatch):
+    monkeypatch.setattr(
+        reaudit_quarantaine, "detecter_anomalies_statistiques",
+        lambda db, df: {"zscore:solaire": pd.Series(False, index=df.index)}
+    )
+    df = pd.DataFrame({
+        "id": [1, 2, 3, 4, 5],
+        "libelle_region": ["Bretagne", "Bretagne", "Bretagne", "nan", "nan"],
+        "date_heure": pd.to_datetime(["2025-01-01"] * 5),
+        "erreur_log": [
+            "bornes:solaire",           # seuil d'une autre règle désormais dépassé
+            "bornes:solaire",           # passe désormais toutes les règles
+            "format:date_heure",        # règle non ré-évaluable
+            "non_nul:libelle_region",   # région absente stockée 'nan'
+            "Échec validation audit",   # ligne héritée avec région absente
+        ],
+        "consommation": [26000.0, 100.0, 100.0, 100.0, 100.0],
+        "nucleaire": [0.0] * 5,
+        "eolien": [0.0] * 5,
+        "solaire": [100.0] * 5,
+    })
+    assert lignes_liberables(None, df).tolist() == [False, True, False, False, False]
@@ -0,0 +1,10 @@
+import pandas as pd
+from src.processor.references_statistiques import heure_du_jour
+
+
+def test_meme_case_horaire_csv_et_base():
+    # La même mesure, lue dans le CSV (avec décalage) ou relue en base (UTC naïf)
+    csv = pd.Series(["2025-07-01T06:00:00+02:00", "2025-01-15T08:00:00+01:00"])
+    base = pd.Series([pd.Timestamp("2025-07-01 04:00:00"), pd.Timestamp("2025-01-15 07:00:00")])
+    assert list(heure_du_jour(csv)) == [6, 8]
+    assert list(heure_du_jour(base)) == [6, 8]